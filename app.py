@@ -3,19 +3,26 @@
 #----------------------------------------------------------------------------#
 import os
 import sys
+import time
+import threading
+import collections
 import dateutil.parser
+from dateutil.relativedelta import relativedelta
 import datetime
 import logging
 from logging import Formatter, FileHandler
 logging.basicConfig(level=logging.DEBUG)
 import babel
+import click
 
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, make_response, jsonify, abort
 from flask_migrate import Migrate
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import FlaskForm, CSRFProtect
+from werkzeug.middleware.proxy_fix import ProxyFix
 from forms import *
+from ratelimit import RateLimiter
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -24,9 +31,12 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 app.config["SQLALCHEMY_ECHO"] = True
+if app.config.get('PROXY_FIX_X_FOR'):
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 csrf = CSRFProtect(app)
+limiter = RateLimiter(app)
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -48,6 +58,12 @@ class Venue(db.Model):
     seeking_description = db.Column(db.String(500))
     venue_show = db.relationship('Show', backref='venue_show', lazy=True)
 
+# Venues are browsed by area, so (state, lower(city)) is indexed to serve
+# /venues?state=..&city=.. without scanning every venue.
+db.Index('ix_Venue_area', Venue.state, db.func.lower(Venue.city))
+db.Index('ix_Venue_name_prefix', db.func.lower(Venue.name).label('lower_name'),
+         postgresql_ops={'lower_name': 'text_pattern_ops'})
+
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
@@ -68,6 +84,10 @@ class Artist(db.Model):
     def __repr__(self):
         return f'<Artist {self.id} {self.name}>'
 
+# lower(name) with text_pattern_ops serves the prefix LIKE of /api/lookup
+db.Index('ix_Artist_name_prefix', db.func.lower(Artist.name).label('lower_name'),
+         postgresql_ops={'lower_name': 'text_pattern_ops'})
+
 
 class Show(db.Model):
     __tablename__ = 'show'
@@ -75,11 +95,25 @@ class Show(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
 
     def __repr__(self):
         return f'<Show {self.id} {self.artist_id} {self.venue_id} {self.start_time}>'
 
+
+# Shows older than ARCHIVE_SHOWS_AFTER_YEARS are moved here by `flask archive-shows`
+# so the hot `show` table only holds recent and upcoming shows.
+class ShowArchive(db.Model):
+    __tablename__ = 'show_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False, index=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False, index=True)
+    start_time = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ShowArchive {self.id} {self.artist_id} {self.venue_id} {self.start_time}>'
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
@@ -94,6 +128,56 @@ def format_datetime(value, format='medium'):
 app.jinja_env.filters['datetime'] = format_datetime
 
 
+#----------------------------------------------------------------------------#
+# Areas.
+#----------------------------------------------------------------------------#
+def normalize_city(city):
+    # collapse repeated/trailing whitespace so 'San  Francisco ' == 'San Francisco'
+    return ' '.join((city or '').split())
+
+
+def normalize_state(state):
+    return (state or '').strip().upper()
+
+
+def area_key(city, state):
+    return (normalize_city(city).lower(), normalize_state(state))
+
+
+#----------------------------------------------------------------------------#
+# Archived shows.
+#----------------------------------------------------------------------------#
+def archived_shows_page(query, endpoint, **values):
+    """Return one page of archived shows, newest first, and the link to the next one.
+
+    Archived shows are only read once the user asks for them (?archived=1) and
+    are paged with a (start_time, id) cursor passed as ?before=&before_id=.
+    """
+    if not request.args.get('archived'):
+        return [], url_for(endpoint, archived=1, **values)
+
+    before = request.args.get('before')
+    if before:
+        try:
+            before = dateutil.parser.parse(before)
+            before_id = int(request.args.get('before_id', 0))
+        except (ValueError, OverflowError):
+            abort(400)
+        query = query.filter(db.tuple_(ShowArchive.start_time, ShowArchive.id) <
+                             db.tuple_(db.literal(before), db.literal(before_id)))
+
+    page_size = app.config.get('ARCHIVE_PAGE_SIZE', 20)
+    rows = query.order_by(ShowArchive.start_time.desc(), ShowArchive.id.desc()).\
+        limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1][0]
+    return rows, url_for(endpoint, archived=1, before=last.start_time.isoformat(),
+                         before_id=last.id, **values)
+
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -105,36 +189,43 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 @app.route('/venues')
+@limiter.limit('read')
 def venues():
-    venues = Venue.query.order_by(Venue.id.desc()).all()
-    uniques = set()
+    query = Venue.query
 
-    for venue in venues:
-        uniques.add((venue.city, venue.state));
-
-    areas = []
-    for unique in uniques:
-        areas.append({
-            "city": unique[0],
-            "state": unique[1],
-            "venues": []
-        })
+    state = request.args.get('state')
+    if state:
+        query = query.filter(Venue.state == normalize_state(state))
+
+    city = request.args.get('city')
+    if city:
+        query = query.filter(db.func.lower(Venue.city) == normalize_city(city).lower())
+
+    venues = query.order_by(Venue.id.desc()).all()
 
     num_shows = 0
 
+    # group venues into areas in a single pass, keyed by normalized (city, state)
+    areas = {}
     for venue in venues:
-        for area in areas:
-            if area['city'] == venue.city and area['state'] == venue.state:
-                area['venues'].append({
-                    'id': venue.id,
-                    'name': venue.name,
-                    'num_upcoming_shows': num_shows
-                })
+        key = area_key(venue.city, venue.state)
+        if key not in areas:
+            areas[key] = {
+                "city": normalize_city(venue.city),
+                "state": normalize_state(venue.state),
+                "venues": []
+            }
+        areas[key]['venues'].append({
+            'id': venue.id,
+            'name': venue.name,
+            'num_upcoming_shows': num_shows
+        })
 
-    return  render_template('pages/venues.html', areas=areas);
+    return  render_template('pages/venues.html', areas=list(areas.values()));
 
 
 @app.route('/venues/search', methods=['POST'])
+@limiter.limit('search')
 def search_venues():
     name = request.form.get('search_term')
     venues = Venue.query.filter(Venue.name.ilike('%'+name+'%')).all()
@@ -147,6 +238,7 @@ def search_venues():
 
 
 @app.route('/venues/<int:venue_id>')
+@limiter.limit('read')
 def show_venue(venue_id):
     venue = Venue.query.filter(Venue.id == venue_id).first()
     venue.genres = venue.genres.replace('{', '')
@@ -177,6 +269,16 @@ def show_venue(venue_id):
         filter(Venue.id == venue_id). \
         filter(Show.start_time < datetime.now()).all()
 
+    archived, older_shows_url = archived_shows_page(
+        ShowArchive.query.join(Artist, ShowArchive.artist_id == Artist.id).\
+            add_columns(Artist.name, Artist.image_link).\
+            filter(ShowArchive.venue_id == venue_id),
+        'show_venue', venue_id=venue_id)
+    datas += archived
+
+    # hot and archived rows are merged, so order the combined list newest first
+    datas.sort(key=lambda item: item[0].start_time, reverse=True)
+
     past_shows = []
     for item in datas:
         past_shows.append({
@@ -188,6 +290,7 @@ def show_venue(venue_id):
 
     venue.past_shows_count = len(past_shows)
     venue.past_shows = past_shows
+    venue.older_shows_url = older_shows_url
 
     return render_template('pages/show_venue.html', venue=venue)
 
@@ -201,12 +304,13 @@ def create_venue_form():
 
 
 @app.route('/venues/create', methods=['POST'])
+@limiter.limit('write')
 def create_venue_submission():
     try:
         venue = Venue(
             name  = request.form['name'],
-            city  = request.form['city'],
-            state = request.form['state'],
+            city  = normalize_city(request.form['city']),
+            state = normalize_state(request.form['state']),
             address = request.form['address'],
             phone   = request.form['phone'],
             genres  = request.form['genres'],
@@ -238,15 +342,36 @@ def delete_venue(venue_id):
   return None
 
 
+@app.cli.command('normalize-venues')
+def normalize_venues_command():
+    """Rewrite stored venue city/state in their normalized form."""
+    count = 0
+    try:
+        for venue in Venue.query.all():
+            city, state = normalize_city(venue.city), normalize_state(venue.state)
+            if (city, state) != (venue.city, venue.state):
+                venue.city, venue.state = city, state
+                count += 1
+        db.session.commit()
+        click.echo('Normalized {} venues.'.format(count))
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.close()
+
+
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@limiter.limit('read')
 def artists():
   artists = Artist.query.order_by(Artist.id.desc()).all()
   return render_template('pages/artists.html', artists=artists)
 
 
 @app.route('/artists/search', methods=['POST'])
+@limiter.limit('search')
 def search_artists():
     name = request.form.get('search_term')
     artists = Artist.query.filter(Artist.name.ilike('%' + name + '%')).all()
@@ -258,6 +383,7 @@ def search_artists():
 
 
 @app.route('/artists/<int:artist_id>')
+@limiter.limit('read')
 def show_artist(artist_id):
   artist = Artist.query.filter(Artist.id == artist_id).first()
   artist.genres = artist.genres.replace('{', '')
@@ -286,6 +412,16 @@ def show_artist(artist_id):
       filter(Show.artist_id == artist_id).\
       filter(Show.start_time < datetime.now()).all()
 
+  archived, older_shows_url = archived_shows_page(
+      ShowArchive.query.join(Venue, ShowArchive.venue_id == Venue.id).\
+          add_columns(Venue.name, Venue.image_link).\
+          filter(ShowArchive.artist_id == artist_id),
+      'show_artist', artist_id=artist_id)
+  datas += archived
+
+  # hot and archived rows are merged, so order the combined list newest first
+  datas.sort(key=lambda item: item[0].start_time, reverse=True)
+
   past_shows = []
   for item in datas:
       past_shows.append({
@@ -297,6 +433,7 @@ def show_artist(artist_id):
 
   artist.past_shows_count   = len(past_shows)
   artist.past_shows = past_shows
+  artist.older_shows_url = older_shows_url
 
   return render_template('pages/show_artist.html', artist=artist)
 
@@ -311,6 +448,7 @@ def edit_artist(artist_id):
 
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@limiter.limit('write')
 def edit_artist_submission(artist_id):
     form = ArtistForm()
     if form.validate():
@@ -350,6 +488,7 @@ def edit_venue(venue_id):
 
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@limiter.limit('write')
 def edit_venue_submission(venue_id):
     form = VenueForm(request.form)
 
@@ -357,8 +496,8 @@ def edit_venue_submission(venue_id):
         try:
             venue = {
                 "name": request.form['name'],
-                "city": request.form['city'],
-                "state": request.form['state'],
+                "city": normalize_city(request.form['city']),
+                "state": normalize_state(request.form['state']),
                 "phone": request.form['phone'],
                 "genres": request.form.getlist('genres'),
                 "facebook_link": request.form['facebook_link'],
@@ -391,6 +530,7 @@ def create_artist_form():
 
 
 @app.route('/artists/create', methods=['POST'])
+@limiter.limit('write')
 def create_artist_submission():
     form = ArtistForm(request.form)
 
@@ -427,20 +567,31 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 @app.route('/shows')
+@limiter.limit('read')
 def shows():
-  shows = []
   datas = Show.query.join("artist_show").join("venue_show").order_by(Show.start_time.desc()).all()
-  for item in datas:
+  rows = [(item, item.venue_show.name, item.artist_show.name, item.artist_show.image_link) for item in datas]
+
+  archived, older_shows_url = archived_shows_page(
+    ShowArchive.query.join(Venue, ShowArchive.venue_id == Venue.id).\
+      join(Artist, ShowArchive.artist_id == Artist.id).\
+      add_columns(Venue.name, Artist.name, Artist.image_link),
+    'shows')
+  rows += archived
+  rows.sort(key=lambda row: row[0].start_time, reverse=True)
+
+  shows = []
+  for item, venue_name, artist_name, artist_image_link in rows:
     shows.append({
       "venue_id": item.venue_id,
-      "venue_name": item.venue_show.name,
+      "venue_name": venue_name,
       "artist_id": item.artist_id,
-      "artist_name": item.artist_show.name,
-      "artist_image_link": item.artist_show.image_link,
+      "artist_name": artist_name,
+      "artist_image_link": artist_image_link,
       "start_time": format_datetime(str(item.start_time))
     })
 
-  return render_template('pages/shows.html', shows=shows)
+  return render_template('pages/shows.html', shows=shows, older_shows_url=older_shows_url)
 
 
 @app.route('/shows/create')
@@ -450,13 +601,25 @@ def create_shows():
 
 
 @app.route('/shows/create', methods=['POST'])
+@limiter.limit('write')
 def create_show_submission():
     form = ShowForm(request.form)
     if form.validate():
         try:
+            # check both ids in one round trip instead of waiting for the FK error on commit
+            artist_exists, venue_exists = db.session.query(
+                Artist.query.filter(Artist.id == form.artist_id.data).exists(),
+                Venue.query.filter(Venue.id == form.venue_id.data).exists()).one()
+            if not artist_exists:
+                flash('Artist ' + str(form.artist_id.data) + ' does not exist.')
+            if not venue_exists:
+                flash('Venue ' + str(form.venue_id.data) + ' does not exist.')
+            if not (artist_exists and venue_exists):
+                return render_template('forms/new_show.html', form=form)
+
             show = Show(
-                artist_id = request.form['artist_id'],
-                venue_id  = request.form['venue_id'],
+                artist_id = form.artist_id.data,
+                venue_id  = form.venue_id.data,
                 start_time= request.form['start_time'])
             db.session.add(show)
             db.session.commit()
@@ -475,6 +638,241 @@ def create_show_submission():
     return render_template('forms/new_show.html', form=form)
 
 
+#  Lookup
+#  ----------------------------------------------------------------
+lookup_models = {
+    'artist': Artist,
+    'venue': Venue,
+}
+
+
+@app.route('/api/lookup')
+@limiter.limit('search')
+def lookup():
+    model = lookup_models.get(request.args.get('type', 'artist'))
+    if model is None:
+        return jsonify({'error': 'type should be artist or venue'}), 400
+
+    prefix = request.args.get('q', '').strip().lower()
+    if not prefix:
+        return jsonify({'data': []})
+    prefix = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    rows = db.session.query(model.id, model.name).\
+        filter(db.func.lower(model.name).like(prefix + '%', escape='\\')).\
+        order_by(db.func.lower(model.name)).\
+        limit(limit).all()
+
+    return jsonify({'data': [{'id': id, 'name': name} for id, name in rows]})
+
+
+#  Stats
+#  ----------------------------------------------------------------
+stats_cache = {'computed_at': None, 'data': None, 'refreshing': False}
+stats_lock = threading.Lock()
+
+
+def split_genres(genres):
+    genres = (genres or '').replace('{', '').replace('}', '')
+    return [genre.strip('" ') for genre in genres.split(',') if genre.strip('" ')]
+
+
+def all_shows():
+    # stats cover every show, whether it is still in the hot table or archived
+    return db.union_all(
+        db.select(Show.id, Show.artist_id, Show.venue_id, Show.start_time),
+        db.select(ShowArchive.id, ShowArchive.artist_id, ShowArchive.venue_id, ShowArchive.start_time)
+    ).subquery('all_shows')
+
+
+def compute_stats():
+    now = datetime.now()
+    shows = all_shows()
+    row_limit = app.config.get('STATS_ROW_LIMIT', 100)
+    month = db.func.date_trunc('month', shows.c.start_time).label('month')
+
+    shows_per_venue_month = []
+    rows = db.session.query(Venue.id, Venue.name, month, db.func.count(shows.c.id)).\
+        join(shows, shows.c.venue_id == Venue.id).\
+        group_by(Venue.id, Venue.name, month).\
+        order_by(month.desc(), db.func.count(shows.c.id).desc(), Venue.id).\
+        limit(row_limit).all()
+    for venue_id, venue_name, show_month, count in rows:
+        shows_per_venue_month.append({
+            'venue_id': venue_id,
+            'venue_name': venue_name,
+            'month': show_month.strftime('%Y-%m'),
+            'num_shows': count
+        })
+
+    # identical genre strings are collapsed by GROUP BY, only the distinct
+    # (city, state, genres) rows are split in python
+    genres_by_city = collections.defaultdict(collections.Counter)
+    cities = {}
+    for model in (Venue, Artist):
+        rows = db.session.query(model.city, model.state, model.genres, db.func.count(model.id)).\
+            group_by(model.city, model.state, model.genres).all()
+        for city, state, genres, count in rows:
+            # same key as venues(), so spellings differing only in case or spacing merge
+            key = area_key(city, state)
+            cities.setdefault(key, (normalize_city(city), normalize_state(state)))
+            for genre in split_genres(genres):
+                genres_by_city[key][genre] += count
+
+    top_genres_by_city = []
+    for key, counter in sorted(genres_by_city.items()):
+        city, state = cities[key]
+        top_genres_by_city.append({
+            'city': city,
+            'state': state,
+            'genres': counter.most_common(3)
+        })
+
+    num_bookings = db.func.count(shows.c.id)
+    rows = db.session.query(Artist.id, Artist.name, num_bookings,
+                            db.func.rank().over(order_by=num_bookings.desc())).\
+        outerjoin(shows, shows.c.artist_id == Artist.id).\
+        group_by(Artist.id, Artist.name).\
+        order_by(num_bookings.desc(), Artist.id).\
+        limit(row_limit).all()
+    artist_bookings = []
+    for artist_id, artist_name, count, rank in rows:
+        artist_bookings.append({
+            'rank': rank,
+            'artist_id': artist_id,
+            'artist_name': artist_name,
+            'num_shows': count
+        })
+
+    # share of venues seeking talent that already have an upcoming show booked
+    seeking, booked = db.session.query(db.func.count(db.func.distinct(Venue.id)),
+                                       db.func.count(db.func.distinct(Show.venue_id))).\
+        outerjoin(Show, db.and_(Show.venue_id == Venue.id, Show.start_time >= now)).\
+        filter(Venue.seeking_talent.is_(True)).one()
+
+    return {
+        'shows_per_venue_month': shows_per_venue_month,
+        'top_genres_by_city': top_genres_by_city,
+        'artist_bookings': artist_bookings,
+        'seeking_talent': {
+            'venues': seeking,
+            'booked': booked,
+            'fill_rate': booked / seeking if seeking else 0.0
+        },
+        'generated_at': now
+    }
+
+
+def stats_expired():
+    computed_at = stats_cache['computed_at']
+    return computed_at is None or \
+        time.monotonic() - computed_at > app.config.get('STATS_CACHE_SECONDS', 60)
+
+
+def refresh_stats():
+    try:
+        with app.app_context():
+            data = compute_stats()
+        stats_cache['data'] = data
+        stats_cache['computed_at'] = time.monotonic()
+    except Exception:
+        app.logger.exception('stats refresh failed')
+    finally:
+        stats_cache['refreshing'] = False
+
+
+def get_stats():
+    # compute_stats() scans every row of show and show_archive on each run,
+    # so its cost grows linearly with the number of shows (it is neither
+    # incremental nor benchmarked at scale). Only the very first report is
+    # built inside a request; after that the last report is served while a
+    # single background thread rebuilds it once STATS_CACHE_SECONDS pass.
+    if stats_cache['data'] is None:
+        with stats_lock:
+            if stats_cache['data'] is None:
+                stats_cache['data'] = compute_stats()
+                stats_cache['computed_at'] = time.monotonic()
+    elif stats_expired():
+        with stats_lock:
+            start = not stats_cache['refreshing'] and stats_expired()
+            if start:
+                stats_cache['refreshing'] = True
+        if start:
+            threading.Thread(target=refresh_stats, daemon=True).start()
+    return stats_cache['data']
+
+
+@app.route('/stats')
+@limiter.limit('read')
+def stats():
+    return render_template('pages/stats.html', stats=get_stats())
+
+
+@app.cli.command('stats')
+def stats_command():
+    """Print booking statistics."""
+    data = compute_stats()
+
+    click.echo('Shows per venue per month')
+    for row in data['shows_per_venue_month']:
+        click.echo('  {month}  {venue_name} ({venue_id}): {num_shows}'.format(**row))
+
+    click.echo('Top genres by city')
+    for row in data['top_genres_by_city']:
+        genres = ', '.join('{} ({})'.format(genre, count) for genre, count in row['genres'])
+        click.echo('  {}, {}: {}'.format(row['city'], row['state'], genres))
+
+    click.echo('Artist booking frequency')
+    for row in data['artist_bookings']:
+        click.echo('  #{rank} {artist_name} ({artist_id}): {num_shows}'.format(**row))
+
+    seeking = data['seeking_talent']
+    click.echo('Seeking talent fill rate: {}/{} ({:.0%})'.format(
+        seeking['booked'], seeking['venues'], seeking['fill_rate']))
+
+
+#  Archive
+#  ----------------------------------------------------------------
+@app.cli.command('archive-shows')
+@click.option('--years', type=int, default=None,
+              help='Archive shows that started more than this many years ago.')
+def archive_shows_command(years):
+    """Move old shows from the show table into show_archive."""
+    if years is None:
+        years = app.config.get('ARCHIVE_SHOWS_AFTER_YEARS', 2)
+    cutoff = datetime.now() - relativedelta(years=years)
+
+    columns = [Show.id, Show.artist_id, Show.venue_id, Show.start_time]
+    batch_size = 1000
+    count = 0
+    try:
+        # copy and delete by the same id list, so a show committed after the
+        # ids were read is never deleted without having been copied
+        ids = [id for id, in db.session.query(Show.id).filter(Show.start_time < cutoff)]
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            db.session.execute(
+                ShowArchive.__table__.insert().from_select(
+                    [column.name for column in columns],
+                    db.select(*columns).where(Show.id.in_(batch))))
+            count += Show.query.filter(Show.id.in_(batch)).delete(synchronize_session=False)
+        db.session.commit()
+        click.echo('Archived {} shows that started before {}.'.format(count, cutoff))
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.close()
+
+
+#  Metrics
+#  ----------------------------------------------------------------
+@app.route('/metrics')
+def metrics():
+    return Response(limiter.metrics(), mimetype='text/plain')
+
+
 @app.errorhandler(400)
 def not_found_error(error):
     return render_template('errors/400.html', number=400), 400
@@ -503,10 +901,24 @@ def not_found_error(error):
 def not_found_error(error):
     return render_template('errors/422.html', number=422), 422
 
+@app.errorhandler(429)
+def too_many_requests_error(error):
+    response = make_response(render_template('errors/429.html', number=429), 429)
+    if error.retry_after:
+        response.headers['Retry-After'] = error.retry_after
+    return response
+
 @app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html', number=500), 500
 
+@app.errorhandler(503)
+def service_unavailable_error(error):
+    response = make_response(render_template('errors/503.html', number=503), 503)
+    if error.retry_after:
+        response.headers['Retry-After'] = error.retry_after
+    return response
+
 if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
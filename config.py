@@ -8,6 +8,36 @@ DEBUG = True
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Seconds a computed /stats report is reused before it is recomputed.
+STATS_CACHE_SECONDS = 60
+# Rows kept in the per venue/month and artist booking reports.
+STATS_ROW_LIMIT = 100
+
+# Default age of shows moved to show_archive by `flask archive-shows`.
+ARCHIVE_SHOWS_AFTER_YEARS = 2
+# Archived shows read per 'Show older shows' page.
+ARCHIVE_PAGE_SIZE = 20
+
+# Rate limiting per client and route class: (tokens per second, burst).
+# Set RATELIMIT_STORAGE_URL to a redis url to share buckets between workers.
+RATELIMIT_ENABLED = True
+RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL')
+RATELIMITS = {
+    'search': (1, 10),
+    'write': (0.5, 5),
+    'read': (10, 50),
+}
+# Requests of a route class allowed to run at once before 503 is returned.
+RATELIMIT_MAX_INFLIGHT = {
+    'search': 4,
+    'write': 4,
+}
+RATELIMIT_RETRY_AFTER = 1
+
+# Number of trusted reverse proxies in front of the app. When set,
+# X-Forwarded-For from that many hops is used as the client address.
+PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
 # Connect to the database
 DB = 'postgresql'
 DATABASE_NAME = 'FSND_projects_01_fyyur'
@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Regexp, Optional, Length
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, InputRequired, AnyOf, URL, Regexp, Optional, Length, NumberRange
 
 state_choices = [
     ('AL', 'AL'),
@@ -79,20 +79,56 @@ genres_choices = [
     ('Other', 'Other'),
 ]
 
+state_values = frozenset(value for value, _ in state_choices)
+genres_values = frozenset(value for value, _ in genres_choices)
+
+# validators are shared by every form instead of being rebuilt per field
+length_2_120 = Length(min=2, max=120)
+length_10_120 = Length(min=10, max=120)
+# ids are bounded to the Integer column range so lookups never overflow in the DB
+artist_id_range = NumberRange(min=1, max=2**31 - 1, message="Artist id should be between 1 and 2147483647")
+venue_id_range = NumberRange(min=1, max=2**31 - 1, message="Venue id should be between 1 and 2147483647")
+phone_regexp = Regexp("^[0-9]+-?[0-9]+-?[0-9]+$", message="Phone number should only contain digits and '-'")
+
+
+class FrozenSelectField(SelectField):
+    """SelectField checking the submitted value against a frozenset instead of scanning choices."""
+
+    def __init__(self, label=None, validators=None, values=frozenset(), **kwargs):
+        super(FrozenSelectField, self).__init__(label, validators, **kwargs)
+        self.values = values
+
+    def pre_validate(self, form):
+        if self.data not in self.values:
+            raise ValueError(self.gettext('Not a valid choice'))
+
+
+class FrozenSelectMultipleField(SelectMultipleField):
+    """SelectMultipleField checking the submitted values against a frozenset."""
+
+    def __init__(self, label=None, validators=None, values=frozenset(), **kwargs):
+        super(FrozenSelectMultipleField, self).__init__(label, validators, **kwargs)
+        self.values = values
+
+    def pre_validate(self, form):
+        for value in self.data or ():
+            if value not in self.values:
+                raise ValueError(self.gettext("'%(value)s' is not a valid choice for this field") % dict(value=value))
+
+
 class ShowForm(FlaskForm):
-    artist_id = StringField(
+    artist_id = IntegerField(
         'artist_id',
         validators = [
-            DataRequired(),
-            Regexp("^[0-9]+$",message="Artist id should only contain digits")
+            InputRequired(),
+            artist_id_range
         ]
     )
-    venue_id = StringField(
+    venue_id = IntegerField(
         'venue_id',
         validators = [
-            DataRequired(),
-            Regexp("^[0-9]+$",
-                   message="Venue id should only contain digits")
+            InputRequired(),
+            venue_id_range
         ]
     )
     start_time = DateTimeField(
@@ -100,33 +136,31 @@ class ShowForm(FlaskForm):
         validators = [
             DataRequired()
         ],
-        default= datetime.today()
+        default= datetime.today
     )
 
 class VenueForm(FlaskForm):
-    name = StringField('name', validators=[DataRequired(), Length(min=2), Length(max=120)])
-    city = StringField('city', validators=[DataRequired(), Length(min=2), Length(max=120)])
-    state = SelectField(
+    name = StringField('name', validators=[DataRequired(), length_2_120])
+    city = StringField('city', validators=[DataRequired(), length_2_120])
+    state = FrozenSelectField(
         'state', validators=[DataRequired()],
-        choices = state_choices
+        choices = state_choices, values = state_values
     )
     address = StringField(
-        'address', validators=[DataRequired(), Length(min=2), Length(max=120)]
+        'address', validators=[DataRequired(), length_2_120]
     )
     phone = StringField(
         'phone',
         validators = [
             DataRequired(),
-            Regexp("^[0-9]+-?[0-9]+-?[0-9]+$", message="Phone number should only contain digits and '-'"),
-            Length(min=10),
-            Length(max=120)
+            phone_regexp,
+            length_10_120
         ]
     )
     image_link = StringField('image_link', validators=[Optional(), URL()])
-    genres = SelectMultipleField(
-        # TODO implement enum restriction
+    genres = FrozenSelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices = genres_choices
+        choices = genres_choices, values = genres_values
     )
     facebook_link = StringField('facebook_link', validators=[Optional(), URL()])
     website_link = StringField('website_link', validators=[Optional(), URL()])
@@ -136,27 +170,26 @@ class VenueForm(FlaskForm):
     )
 
 class ArtistForm(FlaskForm):
-    name = StringField('name', validators=[DataRequired(), Length(min=2), Length(max=120)])
-    city = StringField('city', validators=[DataRequired(), Length(min=2), Length(max=120)])
-    state = SelectField(
+    name = StringField('name', validators=[DataRequired(), length_2_120])
+    city = StringField('city', validators=[DataRequired(), length_2_120])
+    state = FrozenSelectField(
         'state', validators=[DataRequired()],
-        choices = state_choices
+        choices = state_choices, values = state_values
     )
     phone = StringField(
         'phone',
         validators = [
             DataRequired(),
-            Regexp("^[0-9]+-?[0-9]+-?[0-9]+$", message="Phone number should only contain digits and '-'"),
-            Length(min=2),
-            Length(max=120)
+            phone_regexp,
+            length_2_120
         ]
     )
-    image_link = StringField('image_link', validators=[Optional(), URL(), Length(min=2), Length(max=120)])
-    genres = SelectMultipleField(
+    image_link = StringField('image_link', validators=[Optional(), URL(), length_2_120])
+    genres = FrozenSelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices = genres_choices
+        choices = genres_choices, values = genres_values
     )
-    facebook_link = StringField('facebook_link', validators=[Optional(), URL(), Length(min=2), Length(max=120)])
-    website_link = StringField('website_link', validators=[Optional(), URL(), Length(min=2), Length(max=120)])
+    facebook_link = StringField('facebook_link', validators=[Optional(), URL(), length_2_120])
+    website_link = StringField('website_link', validators=[Optional(), URL(), length_2_120])
     seeking_venue = BooleanField('seeking_venue')
     seeking_description = StringField('seeking_description')
\ No newline at end of file
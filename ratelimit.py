@@ -0,0 +1,171 @@
+import math
+import threading
+import time
+import functools
+from collections import Counter
+
+from flask import request
+from werkzeug.exceptions import TooManyRequests, ServiceUnavailable
+
+
+class MemoryStore(object):
+    """Token buckets kept in this process; fine for a single worker."""
+
+    # seconds between sweeps for buckets idle long enough to be full again
+    prune_interval = 60
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.pruned_at = time.monotonic()
+
+    def prune(self, now):
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items()
+            if now - bucket[1] < bucket[2]
+        }
+        self.pruned_at = now
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.pruned_at > self.prune_interval:
+                self.prune(now)
+            tokens, updated_at, _ = self.buckets.get(key, (burst, now, 0))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # a bucket idle for burst / rate seconds is full and can be dropped
+            self.buckets[key] = (tokens, now, burst / rate)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+
+class RedisStore(object):
+    """Token buckets shared by every worker through redis."""
+
+    script = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.take_token = self.client.register_script(self.script)
+
+    def take(self, key, rate, burst):
+        allowed, tokens = self.take_token(keys=['ratelimit:' + key], args=[rate, burst, time.time()])
+        allowed = bool(allowed)
+        return allowed, 0 if allowed else (1 - float(tokens)) / rate
+
+
+class RateLimiter(object):
+    """Per client token buckets and in-flight load shedding by route class.
+
+    Route classes ('search', 'write', 'read', ...) are configured with
+    RATELIMITS = {route_class: (tokens per second, burst)} and
+    RATELIMIT_MAX_INFLIGHT = {route_class: concurrent requests}.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        self.inflight = Counter()
+        self.inflight_lock = threading.Lock()
+        self.decisions = Counter()
+        self.decisions_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE_URL', None)
+        app.config.setdefault('RATELIMITS', {})
+        app.config.setdefault('RATELIMIT_MAX_INFLIGHT', {})
+        app.config.setdefault('RATELIMIT_RETRY_AFTER', 1)
+
+        url = app.config['RATELIMIT_STORAGE_URL']
+        self.store = RedisStore(url) if url else MemoryStore()
+
+    def client_key(self):
+        # X-Forwarded-For is client controlled; behind a proxy set PROXY_FIX_X_FOR
+        # so ProxyFix rewrites remote_addr from the trusted hops only
+        return request.remote_addr
+
+    def count(self, route_class, decision):
+        with self.decisions_lock:
+            self.decisions[(route_class, decision)] += 1
+
+    def check_rate(self, route_class):
+        limit = self.app.config['RATELIMITS'].get(route_class)
+        if limit is None:
+            return
+        rate, burst = limit
+        key = '{}:{}'.format(route_class, self.client_key())
+        allowed, retry_after = self.store.take(key, rate, burst)
+        if not allowed:
+            self.count(route_class, 'limited')
+            raise TooManyRequests(retry_after=max(1, math.ceil(retry_after)))
+
+    def enter(self, route_class):
+        max_inflight = self.app.config['RATELIMIT_MAX_INFLIGHT'].get(route_class)
+        with self.inflight_lock:
+            if max_inflight is not None and self.inflight[route_class] >= max_inflight:
+                self.count(route_class, 'shed')
+                raise ServiceUnavailable(retry_after=self.app.config['RATELIMIT_RETRY_AFTER'])
+            self.inflight[route_class] += 1
+
+    def leave(self, route_class):
+        with self.inflight_lock:
+            self.inflight[route_class] -= 1
+
+    def limit(self, route_class):
+        def decorator(f):
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                if not self.app.config['RATELIMIT_ENABLED']:
+                    return f(*args, **kwargs)
+                self.check_rate(route_class)
+                self.enter(route_class)
+                try:
+                    self.count(route_class, 'allowed')
+                    return f(*args, **kwargs)
+                finally:
+                    self.leave(route_class)
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        with self.decisions_lock:
+            decisions = dict(self.decisions)
+        with self.inflight_lock:
+            inflight = dict(self.inflight)
+
+        lines = [
+            '# HELP ratelimit_decisions_total Rate limiter decisions by route class.',
+            '# TYPE ratelimit_decisions_total counter',
+        ]
+        for (route_class, decision), count in sorted(decisions.items()):
+            lines.append('ratelimit_decisions_total{{route_class="{}",decision="{}"}} {}'.format(
+                route_class, decision, count))
+        lines += [
+            '# HELP ratelimit_inflight_requests Requests currently running by route class.',
+            '# TYPE ratelimit_inflight_requests gauge',
+        ]
+        for route_class, count in sorted(inflight.items()):
+            lines.append('ratelimit_inflight_requests{{route_class="{}"}} {}'.format(route_class, count))
+        return '\n'.join(lines) + '\n'